@@ -0,0 +1,654 @@
+#!/usr/bin/env python3
+"""Build the local semantic index over the SlopOS sources.
+
+Walks the repository, chunks text files, embeds each chunk with a
+SentenceTransformer model and stores the vectors in a faiss index under
+``knowledge/index/``. Query the result with ``knowledge/query.py``.
+"""
+
+import argparse
+import importlib
+import os
+import queue
+import shutil
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import faiss
+import numpy as np
+import orjson
+import torch
+import xxhash
+from sentence_transformers import SentenceTransformer
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+INDEX_DIR = Path(__file__).resolve().parent / "index"
+
+DEFAULT_EXTENSIONS = {".rs", ".md"}
+ALWAYS_INCLUDE = {"Makefile", "link.ld", "limine.conf", "meson.build"}
+SKIP_DIRS = {".git", "builddir", "target", "third_party", "node_modules", ".venv"}
+
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 200
+
+# OPQ rotation + IVF coarse quantizer + 4-bit PQ codes: ~16x smaller than
+# raw fp32 vectors at a minor recall cost. Only worth training on corpora
+# big enough to feed the coarse centroids.
+IVFPQ_FACTORY = "OPQ16_64,IVF256_HNSW32,PQ16x4fsr"
+IVFPQ_TRAIN_TARGET = 10_000
+IVFPQ_MIN_CHUNKS = 5_000
+
+
+def is_text_file(path: Path) -> bool:
+    """Cheap binary sniff: reject files with NUL bytes in the first 2 KiB."""
+    try:
+        with open(path, "rb") as f:
+            chunk = f.read(2048)
+    except OSError:
+        return False
+    return b"\x00" not in chunk
+
+
+def iter_source_files(root: Path, extensions: set[str]):
+    """Yield ``(path, mtime)`` for repository files worth indexing.
+
+    Walks with os.scandir so the stat result cached on each DirEntry
+    serves both the type check and the mtime lookup — one stat per file
+    instead of a second ``path.stat()`` later.
+    """
+    stack = [root]
+    while stack:
+        try:
+            entries = os.scandir(stack.pop())
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in SKIP_DIRS:
+                        stack.append(Path(entry.path))
+                    continue
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                path = Path(entry.path)
+                if path.suffix in extensions:
+                    # Whitelisted extensions (.rs, .md) are text by
+                    # definition; skip the open+read sniff entirely.
+                    yield path, entry.stat().st_mtime
+                elif entry.name in ALWAYS_INCLUDE and is_text_file(path):
+                    yield path, entry.stat().st_mtime
+
+
+def chunk_text(text: str, max_chars: int, overlap_lines: int):
+    """Split ``text`` into line-aligned chunks of about ``max_chars`` bytes.
+
+    Yields ``(chunk, start_line, end_line)`` with 1-based inclusive line
+    numbers. A chunk closes on the first line boundary at or past the
+    ``max_chars`` budget, so rather than splitting mid-line it overshoots
+    by up to one line. Consecutive chunks share ``overlap_lines`` lines
+    so that context straddling a boundary is still retrievable. Line
+    boundaries come from a single vectorized newline scan over the raw
+    bytes and each boundary is picked with searchsorted — no per-line
+    python loop.
+    """
+    raw = text.encode("utf-8", errors="replace")
+    starts = np.flatnonzero(np.frombuffer(raw, dtype=np.uint8) == 10) + 1
+    if starts.size and starts[-1] == len(raw):
+        # A trailing newline would otherwise count as a phantom line.
+        starts = starts[:-1]
+    # Sentinel so the width of line i (its bytes plus one for the line
+    # break) is always line_starts[i + 1] - line_starts[i]. When the text
+    # already ends with a newline that byte is in raw, so no extra +1 —
+    # otherwise the final line would count one byte wide too many.
+    tail = len(raw) if raw.endswith(b"\n") else len(raw) + 1
+    line_starts = np.concatenate(([0], starts, [tail])).astype(np.int64)
+    num_lines = len(line_starts) - 1
+    start = 0
+    while start < num_lines:
+        # First line boundary putting the chunk at or past max_chars.
+        j = int(
+            np.searchsorted(line_starts, line_starts[start] + max_chars, "left")
+        )
+        if j > num_lines:
+            break
+        chunk = raw[line_starts[start] : line_starts[j] - 1]
+        chunk = chunk.decode("utf-8", errors="replace").strip()
+        if chunk:
+            yield chunk, start + 1, j
+        start = max(j - overlap_lines, start + 1)
+    if start < num_lines:
+        chunk = raw[line_starts[start] :].decode("utf-8", errors="replace").strip()
+        if chunk:
+            yield chunk, start + 1, num_lines
+
+
+def load_previous_index(index_dir: Path, args) -> dict | None:
+    """Stash a compatible previous index aside for incremental reuse.
+
+    Moves ``index_dir`` to a ``.old`` sibling and returns its loaded
+    index, per-file document ids and record offsets so unchanged files
+    can carry their vectors and metadata over without re-encoding.
+    Returns ``None`` (forcing a full rebuild) when no previous run exists
+    or its parameters differ from the current invocation.
+    """
+    needed = (
+        "metadata.header.json",
+        "index.faiss",
+        "metadata.jsonl",
+        "offsets.npy",
+        "columns.npz",
+        "paths.txt",
+    )
+    if not all((index_dir / name).exists() for name in needed):
+        return None
+    try:
+        header = orjson.loads((index_dir / "metadata.header.json").read_bytes())
+    except (OSError, ValueError):
+        return None
+    if (
+        header.get("model") != args.model
+        or header.get("chunk_chars") != args.chunk_chars
+        or header.get("overlap_lines") != args.overlap_lines
+        or header.get("index_type") != args.index_type
+    ):
+        return None
+
+    old_dir = index_dir.with_name(index_dir.name + ".old")
+    if old_dir.exists():
+        shutil.rmtree(old_dir)
+    os.replace(index_dir, old_dir)
+
+    old_index = faiss.read_index(str(old_dir / "index.faiss"))
+    try:
+        # IVF indexes need a direct map before reconstruct works.
+        faiss.extract_index_ivf(old_index).make_direct_map()
+    except RuntimeError:
+        pass
+    offsets = np.load(old_dir / "offsets.npy")
+    columns = np.load(old_dir / "columns.npz")
+    paths = (old_dir / "paths.txt").read_text(encoding="utf-8").splitlines()
+    mtimes = columns["mtime"]
+    files: dict[str, tuple[float, list[int]]] = {}
+    for doc_id, path in enumerate(paths):
+        files.setdefault(path, (float(mtimes[doc_id]), []))[1].append(doc_id)
+    return {
+        "dir": old_dir,
+        "index": old_index,
+        "files": files,
+        "offsets": offsets,
+        "paths": paths,
+        "columns": columns,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--model",
+        default="sentence-transformers/all-MiniLM-L6-v2",
+        help="SentenceTransformer model to embed with",
+    )
+    parser.add_argument("--root", type=Path, default=REPO_ROOT)
+    parser.add_argument("--index-dir", type=Path, default=INDEX_DIR)
+    parser.add_argument(
+        "--encode-batch",
+        type=int,
+        default=None,
+        help="sentences per forward pass (default: 256 on GPU, 64 on CPU)",
+    )
+    parser.add_argument(
+        "--flush-every",
+        type=int,
+        default=4096,
+        help="chunks to aggregate before encoding and adding to the index",
+    )
+    parser.add_argument(
+        "--index-type",
+        choices=("hnsw", "flat", "fp16", "sq8", "ivfpq"),
+        default="hnsw",
+        help="faiss index layout; fp16/sq8 halve/quarter vector memory, "
+        "ivfpq trades recall for ~16x less",
+    )
+    parser.add_argument("--chunk-chars", type=int, default=1200)
+    parser.add_argument("--overlap-lines", type=int, default=4)
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="rebuild from scratch instead of reusing unchanged files",
+    )
+    args = parser.parse_args()
+
+    # Repos repeat a lot of boilerplate (license headers, Cargo.toml
+    # stanzas); identical chunks hash to the same embedding, so cache
+    # them across runs and skip the encoder on hits.
+    hash_cache: dict[int, np.ndarray] = {}
+    cache_path = args.index_dir / "hash_cache.npz"
+    if cache_path.exists() and not args.full:
+        with np.load(cache_path) as data:
+            # Vectors from a different model are useless at best and
+            # silently poison the index when dimensions happen to match,
+            # so only trust a cache keyed to the current model.
+            if "model" in data.files and str(data["model"]) == args.model:
+                hash_cache = dict(zip(data["hashes"].tolist(), data["vectors"]))
+
+    previous = None
+    if args.index_dir.exists():
+        if args.full:
+            shutil.rmtree(args.index_dir)
+        else:
+            previous = load_previous_index(args.index_dir, args)
+            if previous is None:
+                shutil.rmtree(args.index_dir)
+    args.index_dir.mkdir(parents=True)
+    old_files = previous["files"] if previous else {}
+
+    # Forward-only workload: allow TF32 matmuls on Ampere+ and drop all
+    # autograd state from the encoder.
+    torch.set_float32_matmul_precision("high")
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    model = SentenceTransformer(args.model, device=device)
+    model.eval()
+    if device == "cuda":
+        # MiniLM is compute-bound on attention matmuls; fp16 runs them on
+        # tensor cores at no measurable recall cost.
+        model.half()
+    if args.encode_batch is None:
+        args.encode_batch = 256 if device == "cuda" else 64
+    # Encoder, normalization and index add can all stay on the device:
+    # torch_utils patches faiss index methods to ingest torch tensors
+    # (including GPU-resident ones) without a numpy round trip. Loaded
+    # via importlib — an `import faiss.contrib...` statement here would
+    # shadow the module-level `faiss` with an unbound local.
+    gpu_pipeline = (
+        device == "cuda" and faiss.get_num_gpus() > 0 and args.index_type != "hnsw"
+    )
+    if gpu_pipeline:
+        importlib.import_module("faiss.contrib.torch_utils")
+    print(f"encoding on {device}")
+
+    faiss_index = None
+    embedding_dim = None
+    index_type = args.index_type
+    num_documents = 0
+    # Stream document records out as they are embedded instead of holding
+    # every chunk in RAM for one giant json.dump at the end. doc_offsets
+    # records where each record starts (plus a final sentinel) so query.py
+    # can seek straight to a hit instead of scanning lines.
+    doc_file = open(args.index_dir / "metadata.jsonl", "wb")
+    doc_offsets: list[int] = []
+    doc_tail = 0
+    # Structure-of-arrays sidecars: the JSONL carries only chunk content,
+    # while paths and the numeric fields live in columnar form that loads
+    # without touching the JSON decoder.
+    col_paths: list[str] = []
+    col_start: list[int] = []
+    col_end: list[int] = []
+    col_mtime: list[float] = []
+    batch_texts: list[str] = []
+    batch_docs: list[dict] = []
+    # One (hash, cached_vector) entry per pending doc; cached_vector is
+    # None for chunks that still need the encoder.
+    batch_meta: list[tuple[int, np.ndarray | None]] = []
+    # Reused across flushes so each flush writes into the same contiguous
+    # matrix instead of allocating a fresh one for faiss to copy from.
+    embed_buf = None
+    # ivfpq needs a training pass before vectors can be added; stage the
+    # first batches here until enough have accumulated.
+    staged_embeddings: list[np.ndarray] = []
+
+    source_files = sorted(iter_source_files(args.root, DEFAULT_EXTENSIONS))
+    print(f"indexing {len(source_files)} files under {args.root}")
+
+    # StandardGpuResources must outlive any index cloned onto the GPU;
+    # a non-empty list doubles as "the index lives on the GPU".
+    gpu_resources: list = []
+
+    def maybe_to_gpu(index, kind: str):
+        # HNSW has no GPU implementation; everything else gets orders of
+        # magnitude faster add/search from a device when one is present.
+        if kind == "hnsw" or faiss.get_num_gpus() == 0:
+            return index
+        res = faiss.StandardGpuResources()
+        cloner = faiss.GpuClonerOptions()
+        cloner.useFloat16 = True
+        gpu_resources.append(res)
+        return faiss.index_cpu_to_gpu(res, 0, index, cloner)
+
+    def build_index(kind: str, training: np.ndarray | None = None):
+        # Embeddings are unit-normalized, so inner product == cosine
+        # similarity; higher is better.
+        if kind == "flat":
+            return maybe_to_gpu(faiss.IndexFlatIP(embedding_dim), kind)
+        if kind == "hnsw":
+            index = faiss.IndexHNSWFlat(
+                embedding_dim, HNSW_M, faiss.METRIC_INNER_PRODUCT
+            )
+            index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+            return index
+        if kind in ("fp16", "sq8"):
+            # Brute-force search over quantized vectors: same ranking as
+            # flat fp32 to within rounding, half/quarter the memory
+            # traffic on the scan.
+            quantizer = (
+                faiss.ScalarQuantizer.QT_fp16
+                if kind == "fp16"
+                else faiss.ScalarQuantizer.QT_8bit
+            )
+            index = faiss.IndexScalarQuantizer(
+                embedding_dim, quantizer, faiss.METRIC_INNER_PRODUCT
+            )
+            if kind == "sq8":
+                # 8-bit codes need per-dimension ranges; fit them on the
+                # first accumulated batch.
+                index.train(training)
+            return maybe_to_gpu(index, kind)
+        index = faiss.index_factory(
+            embedding_dim, IVFPQ_FACTORY, faiss.METRIC_INNER_PRODUCT
+        )
+        index.train(training)
+        return maybe_to_gpu(index, kind)
+
+    def add_vectors(embeddings: np.ndarray, device_tensor=None):
+        nonlocal faiss_index, embedding_dim
+        if embedding_dim is None:
+            embedding_dim = embeddings.shape[1]
+        if faiss_index is None and args.index_type == "ivfpq":
+            # Copy: callers may hand us a view of the reused flush buffer.
+            staged_embeddings.append(np.array(embeddings, copy=True))
+            staged_rows = sum(e.shape[0] for e in staged_embeddings)
+            if staged_rows >= IVFPQ_TRAIN_TARGET:
+                training = np.vstack(staged_embeddings)
+                faiss_index = build_index("ivfpq", training)
+                faiss_index.add(training)
+                staged_embeddings.clear()
+        else:
+            if faiss_index is None:
+                faiss_index = build_index(args.index_type, training=embeddings)
+            if device_tensor is not None and gpu_resources:
+                # Zero-copy: the GPU index ingests the device tensor
+                # directly via torch_utils.
+                faiss_index.add(device_tensor)
+            else:
+                faiss_index.add(embeddings)
+
+    def write_docs(records: list[bytes]):
+        nonlocal num_documents, doc_tail
+        for record in records:
+            doc_offsets.append(doc_tail)
+            doc_file.write(record)
+            doc_tail += len(record)
+        num_documents += len(records)
+
+    def flush():
+        nonlocal embed_buf
+        if not batch_docs:
+            return
+        embeddings = None
+        if batch_texts:
+            # Hand the whole aggregate to encode; its internal batcher
+            # slices it into encode_batch-sized forward passes without
+            # per-call tokenizer and kernel-launch overhead in between.
+            # Sorting by length first keeps each forward pass padded to
+            # similar-sized neighbours instead of the longest chunk in a
+            # random batch.
+            order = sorted(
+                range(len(batch_texts)), key=lambda i: len(batch_texts[i])
+            )
+            # On the GPU pipeline, keep the result as a device tensor so
+            # the normalization fused into encode never leaves the card;
+            # otherwise take numpy directly.
+            embeddings = model.encode(
+                [batch_texts[i] for i in order],
+                batch_size=args.encode_batch,
+                normalize_embeddings=True,
+                convert_to_tensor=gpu_pipeline,
+                convert_to_numpy=not gpu_pipeline,
+                show_progress_bar=False,
+            )
+        if embed_buf is None:
+            dim = (
+                embeddings.shape[1]
+                if embeddings is not None
+                else batch_meta[0][1].shape[0]
+            )
+            if device == "cuda":
+                # Pinned host memory keeps the device-to-host embedding
+                # copies off the pageable path.
+                embed_buf = torch.empty(
+                    (args.flush_every, dim),
+                    dtype=torch.float32,
+                    pin_memory=True,
+                ).numpy()
+            else:
+                embed_buf = np.empty((args.flush_every, dim), dtype=np.float32)
+        staging = embed_buf[: len(batch_docs)]
+        device_tensor = None
+        if embeddings is not None:
+            # Undo the sort so embedding rows line up with batch_docs
+            # again, writing straight into the staging buffer. The
+            # assignment also widens the fp16 GPU path back to the fp32
+            # faiss expects.
+            inv = np.argsort(order)
+            if torch.is_tensor(embeddings):
+                unsorted = embeddings.index_select(
+                    0, torch.as_tensor(inv, device=embeddings.device)
+                ).to(torch.float32)
+                if len(batch_texts) == len(batch_docs):
+                    # All-fresh batch: the GPU index can ingest the
+                    # tensor directly; one copy lands in the pinned
+                    # buffer for the hash cache.
+                    device_tensor = unsorted
+                    torch.from_numpy(staging).copy_(unsorted)
+                else:
+                    fresh_rows = np.asarray(
+                        [i for i, (_, vec) in enumerate(batch_meta) if vec is None]
+                    )
+                    staging[fresh_rows] = unsorted.cpu().numpy()
+            elif len(batch_texts) == len(batch_docs):
+                if embeddings.dtype == np.float32:
+                    np.take(embeddings, inv, axis=0, out=staging)
+                else:
+                    staging[...] = embeddings[inv]
+            else:
+                fresh_rows = np.asarray(
+                    [i for i, (_, vec) in enumerate(batch_meta) if vec is None]
+                )
+                staging[fresh_rows] = embeddings[inv]
+        for row, (_, vec) in zip(staging, batch_meta):
+            if vec is not None:
+                row[...] = vec
+        add_vectors(staging, device_tensor)
+        # Remember freshly encoded rows for future duplicate chunks; the
+        # copy detaches them from the reused staging buffer.
+        for row, (chunk_hash, vec) in zip(staging, batch_meta):
+            if vec is None and chunk_hash not in hash_cache:
+                hash_cache[chunk_hash] = row.copy()
+        write_docs([orjson.dumps(doc["content"]) + b"\n" for doc in batch_docs])
+        for doc in batch_docs:
+            col_paths.append(doc["path"])
+            col_start.append(doc["start_line"])
+            col_end.append(doc["end_line"])
+            col_mtime.append(doc["mtime"])
+        batch_texts.clear()
+        batch_docs.clear()
+        batch_meta.clear()
+
+    reused = 0
+
+    def reuse_file(doc_ids: list[int]):
+        """Carry an unchanged file's vectors and records over verbatim."""
+        nonlocal reused
+        # Flush first so reused rows land at the same position in the
+        # index as their records do in the document stream.
+        flush()
+        ids = np.asarray(doc_ids, dtype=np.int64)
+        vectors = previous["index"].reconstruct_batch(ids)
+        add_vectors(np.ascontiguousarray(vectors, dtype=np.float32))
+        offsets = previous["offsets"]
+        records = []
+        for i in doc_ids:
+            old_doc_file.seek(int(offsets[i]))
+            records.append(old_doc_file.read(int(offsets[i + 1] - offsets[i])))
+        write_docs(records)
+        columns = previous["columns"]
+        for i in doc_ids:
+            col_paths.append(previous["paths"][i])
+            col_start.append(int(columns["start_line"][i]))
+            col_end.append(int(columns["end_line"][i]))
+            col_mtime.append(float(columns["mtime"][i]))
+        reused += len(doc_ids)
+
+    old_doc_file = open(previous["dir"] / "metadata.jsonl", "rb") if previous else None
+
+    def produce_chunks(source):
+        """Read and chunk one ``(path, mtime)`` entry; runs on the pool."""
+        path, mtime = source
+        rel_path = str(path.relative_to(args.root))
+        cached = old_files.get(rel_path)
+        if cached is not None and cached[0] == mtime:
+            # Unchanged since the previous run; its vectors and records
+            # can be carried over without re-reading the file.
+            return "cached", cached[1]
+        try:
+            text = path.read_text(encoding="utf-8", errors="replace")
+        except OSError as exc:
+            print(f"skipping {path}: {exc}", file=sys.stderr)
+            return None
+        chunks = list(
+            chunk_text(text, args.chunk_chars, args.overlap_lines)
+        )
+        return "fresh", (rel_path, mtime, chunks)
+
+    # Overlap disk IO and pure-python chunking with encoding: a thread
+    # pool reads ahead while the main loop feeds the model. Futures land
+    # on the queue in submission order, keeping document ids
+    # deterministic, and because put() blocks once 64 are outstanding
+    # the submission loop itself is throttled — executor.map would
+    # eagerly submit the whole corpus and materialize every result
+    # regardless of the bounded queue, so read-ahead stays capped at
+    # queue size plus the pool's in-flight tasks.
+    produced: queue.Queue = queue.Queue(maxsize=64)
+    done = object()
+
+    def producer():
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            for source in source_files:
+                produced.put(executor.submit(produce_chunks, source))
+        produced.put(done)
+
+    threading.Thread(target=producer, daemon=True).start()
+
+    # The whole encode phase is forward-only; inference_mode drops
+    # autograd tracking and its per-call buffer churn.
+    file_idx = 0
+    with torch.inference_mode():
+        while True:
+            item = produced.get()
+            if item is done:
+                break
+            item = item.result()
+            file_idx += 1
+            if file_idx % 100 == 0:
+                print(f"  {file_idx}/{len(source_files)} files")
+            if item is None:
+                continue
+            tag, payload = item
+            if tag == "cached":
+                reuse_file(payload)
+                continue
+            rel_path, mtime, chunks = payload
+            for chunk, start_line, end_line in chunks:
+                chunk_hash = xxhash.xxh64_intdigest(chunk.encode("utf-8"))
+                cached_vec = hash_cache.get(chunk_hash)
+                if cached_vec is None:
+                    batch_texts.append(chunk)
+                batch_meta.append((chunk_hash, cached_vec))
+                batch_docs.append(
+                    {
+                        "path": rel_path,
+                        "content": chunk,
+                        "start_line": start_line,
+                        "end_line": end_line,
+                        "mtime": mtime,
+                    }
+                )
+                if len(batch_docs) >= args.flush_every:
+                    flush()
+
+        flush()
+
+    if previous:
+        old_doc_file.close()
+        shutil.rmtree(previous["dir"])
+
+    if staged_embeddings:
+        staged = np.vstack(staged_embeddings)
+        if staged.shape[0] < IVFPQ_MIN_CHUNKS:
+            # Too few chunks to train meaningful coarse centroids; brute
+            # force is cheap at this size anyway.
+            index_type = "flat"
+            faiss_index = build_index("flat")
+        else:
+            faiss_index = build_index("ivfpq", staged)
+        faiss_index.add(staged)
+        staged_embeddings.clear()
+
+    doc_file.close()
+    if hash_cache:
+        np.savez(
+            args.index_dir / "hash_cache.npz",
+            model=np.asarray(args.model),
+            hashes=np.fromiter(
+                hash_cache.keys(), dtype=np.uint64, count=len(hash_cache)
+            ),
+            vectors=np.stack(list(hash_cache.values())),
+        )
+    # One offset per document plus a sentinel at EOF, so record i spans
+    # offsets[i]:offsets[i + 1].
+    doc_offsets.append(doc_tail)
+    np.save(args.index_dir / "offsets.npy", np.asarray(doc_offsets, dtype=np.int64))
+    with open(args.index_dir / "paths.txt", "w", encoding="utf-8") as f:
+        f.write("\n".join(col_paths))
+        f.write("\n")
+    np.savez(
+        args.index_dir / "columns.npz",
+        start_line=np.asarray(col_start, dtype=np.int64),
+        end_line=np.asarray(col_end, dtype=np.int64),
+        # float64 rather than int64 so sub-second mtimes survive the
+        # round trip and incremental rebuilds compare exactly.
+        mtime=np.asarray(col_mtime, dtype=np.float64),
+    )
+
+    if faiss_index is None:
+        print("no indexable content found", file=sys.stderr)
+        return 1
+
+    if gpu_resources:
+        # write_index only understands CPU indexes.
+        faiss_index = faiss.index_gpu_to_cpu(faiss_index)
+    faiss.write_index(faiss_index, str(args.index_dir / "index.faiss"))
+    header = {
+        "model": args.model,
+        "embedding_dim": embedding_dim,
+        "chunk_chars": args.chunk_chars,
+        "overlap_lines": args.overlap_lines,
+        "index_type": index_type,
+        "ef_search": 64,
+        "indexed_at": time.time(),
+        "num_documents": num_documents,
+    }
+    with open(args.index_dir / "metadata.header.json", "wb") as f:
+        f.write(orjson.dumps(header, option=orjson.OPT_INDENT_2))
+
+    print(
+        f"indexed {num_documents} chunks into {args.index_dir}"
+        f" ({reused} reused from previous run)"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
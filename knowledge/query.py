@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""Query the local semantic index built by ``knowledge/index.py``.
+
+One-shot mode loads the model and index, answers, and exits. For
+interactive use, start ``--daemon`` once: it keeps everything warm behind
+a unix socket, and subsequent one-shot invocations transparently route
+through it instead of paying the multi-second model load per query.
+"""
+
+import argparse
+import json
+import mmap
+import os
+import socket
+import sys
+from pathlib import Path
+
+import faiss
+import numpy as np
+import orjson
+import torch
+from sentence_transformers import SentenceTransformer
+
+INDEX_DIR = Path(__file__).resolve().parent / "index"
+SOCKET_NAME = "query.sock"
+
+
+def load_documents(index_dir: Path, ids: list[int]) -> dict[int, dict]:
+    """Assemble only the requested records out of the streamed metadata.
+
+    index.py stores chunk content one JSON string per line (indexed by
+    offsets.npy, with an EOF sentinel) and keeps paths plus the numeric
+    fields in columnar sidecars. Seeking through a memory map and
+    decoding just the hit records keeps lookup cost at O(top_k),
+    independent of corpus size.
+    """
+    offsets = np.load(index_dir / "offsets.npy", mmap_mode="r")
+    columns = np.load(index_dir / "columns.npz")
+    paths = (index_dir / "paths.txt").read_text(encoding="utf-8").splitlines()
+    docs: dict[int, dict] = {}
+    with open(index_dir / "metadata.jsonl", "rb") as f:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for idx in ids:
+                docs[idx] = {
+                    "path": paths[idx],
+                    "content": orjson.loads(mm[offsets[idx] : offsets[idx + 1]]),
+                    "start_line": int(columns["start_line"][idx]),
+                    "end_line": int(columns["end_line"][idx]),
+                    "mtime": float(columns["mtime"][idx]),
+                }
+    return docs
+
+
+def build_searcher(index_dir: Path):
+    """Load header, index and model once; return a query closure."""
+    metadata = orjson.loads((index_dir / "metadata.header.json").read_bytes())
+
+    faiss_index = faiss.read_index(str(index_dir / "index.faiss"))
+    if metadata.get("index_type") == "ivfpq":
+        faiss.extract_index_ivf(faiss_index).nprobe = 16
+    gpu_resources = None
+    if metadata.get("index_type") != "hnsw" and faiss.get_num_gpus() > 0:
+        # HNSW has no GPU implementation; everything else searches much
+        # faster on a device. Resources must outlive the index, so a
+        # reference is pinned onto the returned closure.
+        gpu_resources = faiss.StandardGpuResources()
+        cloner = faiss.GpuClonerOptions()
+        cloner.useFloat16 = True
+        faiss_index = faiss.index_cpu_to_gpu(gpu_resources, 0, faiss_index, cloner)
+    device = "cuda" if torch.cuda.is_available() else "cpu"
+    model = SentenceTransformer(metadata["model"], device=device)
+    model.eval()
+    if device == "cuda":
+        model.half()
+
+    def search(queries: list[str], top_k: int) -> list[list[dict]]:
+        if hasattr(faiss_index, "hnsw"):
+            # Widen the candidate beam with top_k; the indexed default
+            # keeps small-k queries fast without sacrificing recall.
+            faiss_index.hnsw.efSearch = max(
+                metadata.get("ef_search", 64), 4 * top_k
+            )
+        with torch.inference_mode():
+            query_vecs = model.encode(
+                queries,
+                normalize_embeddings=True,
+                convert_to_numpy=True,
+                show_progress_bar=False,
+            )
+        query_vecs = np.asarray(query_vecs, dtype=np.float32)
+        # Inner product over unit vectors: scores are cosine
+        # similarities, returned in descending order. One search call for
+        # the whole query matrix lets faiss tile the scan across threads
+        # and SIMD lanes.
+        scores, indices = faiss_index.search(query_vecs, top_k)
+        hits = sorted({int(i) for row in indices for i in row if i >= 0})
+        documents = load_documents(index_dir, hits)
+        return [
+            [
+                {**documents[int(idx)], "score": float(score)}
+                for score, idx in zip(score_row, index_row)
+                if idx >= 0
+            ]
+            for score_row, index_row in zip(scores, indices)
+        ]
+
+    search.gpu_resources = gpu_resources
+    return search
+
+
+def run_daemon(index_dir: Path) -> int:
+    """Serve queries over a unix socket, one JSON object per line."""
+    sock_path = index_dir / SOCKET_NAME
+    sock_path.unlink(missing_ok=True)
+    search = build_searcher(index_dir)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+        server.bind(str(sock_path))
+        server.listen()
+        print(f"serving queries on {sock_path}")
+        while True:
+            conn, _ = server.accept()
+            with conn, conn.makefile("rw", encoding="utf-8") as stream:
+                for line in stream:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        request = json.loads(line)
+                        results = search(
+                            [request["query"]], int(request.get("top_k", 5))
+                        )[0]
+                        response = {"results": results}
+                    except Exception as exc:  # keep the daemon alive
+                        response = {"error": str(exc)}
+                    stream.write(json.dumps(response))
+                    stream.write("\n")
+                    stream.flush()
+
+
+def query_daemon(sock_path: Path, query: str, top_k: int) -> list[dict] | None:
+    """Ask a running daemon; returns None when none is answering."""
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+            client.connect(str(sock_path))
+            with client.makefile("rw", encoding="utf-8") as stream:
+                stream.write(json.dumps({"query": query, "top_k": top_k}))
+                stream.write("\n")
+                stream.flush()
+                response = json.loads(stream.readline())
+    except (OSError, ValueError):
+        # No socket, or the daemon died mid-conversation and we read an
+        # empty/truncated reply; fall back to a local search either way.
+        return None
+    if "error" in response:
+        raise RuntimeError(response["error"])
+    return response["results"]
+
+
+def print_results(results: list[dict]) -> None:
+    for doc in results:
+        print(
+            f"--- {doc['path']}:{doc['start_line']}-{doc['end_line']} "
+            f"score={doc['score']:.3f}"
+        )
+        print(doc["content"])
+        print()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "query",
+        nargs="?",
+        help="natural-language question about the codebase",
+    )
+    parser.add_argument("--index-dir", type=Path, default=INDEX_DIR)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument(
+        "--daemon",
+        action="store_true",
+        help="stay resident and serve queries over a unix socket",
+    )
+    parser.add_argument(
+        "--batch",
+        action="store_true",
+        help="read one query per stdin line and answer them in one search",
+    )
+    args = parser.parse_args()
+
+    # Flat scans are embarrassingly parallel over the database; make sure
+    # faiss actually uses every core instead of its conservative default.
+    faiss.omp_set_num_threads(os.cpu_count())
+
+    if args.daemon:
+        return run_daemon(args.index_dir)
+    if args.batch:
+        queries = [line.strip() for line in sys.stdin if line.strip()]
+        if not queries:
+            return 0
+        searcher = build_searcher(args.index_dir)
+        for query, results in zip(queries, searcher(queries, args.top_k)):
+            print(f"=== {query}")
+            print_results(results)
+        return 0
+    if args.query is None:
+        parser.error("query is required unless --daemon or --batch is given")
+
+    results = query_daemon(args.index_dir / SOCKET_NAME, args.query, args.top_k)
+    if results is None:
+        results = build_searcher(args.index_dir)([args.query], args.top_k)[0]
+    print_results(results)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())